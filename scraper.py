@@ -4,110 +4,313 @@ eBird Notable Sightings Scraper
 Fetches notable bird sightings from eBird API and generates static HTML/JSON.
 """
 
+import asyncio
+import gzip
+import hashlib
 import json
 import os
-import requests
-from datetime import datetime
+import platform
+import re
+import time
+import httpx
+from dataclasses import asdict, dataclass
+from html import escape
 from pathlib import Path
+from urllib.parse import quote
+
+# Fastest available JSON backend: orjson on CPython, ujson on PyPy (where
+# orjson isn't available), else the stdlib json module.
+orjson = ujson = None
+if platform.python_implementation() == "PyPy":
+    try:
+        import ujson
+    except ImportError:
+        pass
+else:
+    try:
+        import orjson
+    except ImportError:
+        pass
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+def _dumps(obj):
+    """Serialize obj to pretty-printed UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    if ujson is not None:
+        return ujson.dumps(
+            obj, indent=2, ensure_ascii=False, escape_forward_slashes=False, default=asdict
+        ).encode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False, default=asdict).encode("utf-8")
+
+
+def _loads(data):
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+# Upper bound on in-flight region requests
+MAX_CONCURRENCY = 8
+
+# Transient responses worth retrying, with exponential backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+
+# Only advertise Brotli when a decoder is installed for httpx to use
+ACCEPT_ENCODING = "br, gzip" if brotli is not None else "gzip"
+
+# Timestamp format for the "Last updated" line, always in UTC
+LAST_UPDATED_FORMAT = "%Y-%m-%d %H:%M UTC"
+
+# Per-region ETags from the last run, stored next to data.json
+ETAGS_FILENAME = ".etags.json"
+
+# Content hash of the last rendered page, stored next to data.json
+STATE_FILENAME = ".state.json"
+
+
+@dataclass(slots=True)
+class Observation:
+    """A formatted observation, as rendered to HTML and saved to data.json."""
+    species: str
+    scientific_name: str
+    count: int | str
+    location: str
+    date: str
+    lat: float | None
+    lng: float | None
+    checklist_url: str | None
+    species_url: str | None
+    location_id: str
+    observer: str
+    is_valid: bool
+    is_reviewed: bool
 
 
 def load_config():
     """Load configuration from config.json."""
     config_path = Path(__file__).parent / "config.json"
-    with open(config_path) as f:
-        return json.load(f)
+    with open(config_path, "rb") as f:
+        return _loads(f.read())
 
 
-def fetch_notable_observations(api_key, region_code, days_back=7, max_results=100):
+def load_cache(output_dir):
+    """
+    Load the previous run's ETags and formatted observations.
+
+    Returns {region_code: {"etag": ..., "observations": [...]}} for every
+    region that has both a saved ETag and error-free data in data.json.
+    """
+    try:
+        with open(output_dir / ETAGS_FILENAME, "rb") as f:
+            etags = _loads(f.read())
+        with open(output_dir / "data.json", "rb") as f:
+            previous = _loads(f.read())
+
+        cache = {}
+        for region_data in previous.get("regions", []):
+            etag = etags.get(region_data["code"])
+            if etag and "error" not in region_data:
+                cache[region_data["code"]] = {
+                    "etag": etag,
+                    "observations": [Observation(**obs) for obs in region_data["observations"]]
+                }
+        return cache
+    except (OSError, ValueError, TypeError, KeyError):
+        # Missing or stale cache (e.g. an older Observation field set);
+        # fall back to a full fetch
+        return {}
+
+
+def write_atomic(path, data):
+    """
+    Write bytes to path via a temp file and os.replace, so readers never
+    see a partially written file.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb", buffering=1 << 20) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_state(output_dir):
+    """Load the previous run's state, or an empty dict if there is none."""
+    try:
+        with open(output_dir / STATE_FILENAME, "rb") as f:
+            return _loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def source_hash():
+    """
+    Hash the script's own source.
+
+    Saved state (the ETag cache and the content hash) is only trusted when
+    this matches, so template or format changes force a full rebuild.
+    """
+    return hashlib.blake2b(Path(__file__).read_bytes()).hexdigest()
+
+
+def content_hash(all_observations):
+    """Hash the formatted observations that determine the page body."""
+    return hashlib.blake2b(_dumps(all_observations)).hexdigest()
+
+
+async def fetch_notable_observations(client, region_code, days_back=7, max_results=100, etag=None):
     """
     Fetch notable observations from eBird API.
 
+    If etag is given the request is conditional; an unchanged region comes
+    back as (None, etag) without a body. Otherwise returns (observations,
+    new_etag).
+
     API Endpoint: GET /v2/data/obs/{regionCode}/recent/notable
     Docs: https://documenter.getpostman.com/view/664302/S1ENwy59
     """
     url = f"https://api.ebird.org/v2/data/obs/{region_code}/recent/notable"
-    headers = {"X-eBirdApiToken": api_key}
     params = {
         "back": days_back,
         "maxResults": max_results,
         "detail": "full"
     }
-
-    response = requests.get(url, headers=headers, params=params)
+    headers = {"If-None-Match": etag} if etag else None
+
+    for attempt in range(MAX_RETRIES + 1):
+        response = await client.get(url, params=params, headers=headers)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            break
+        await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+    if response.status_code == 304:
+        return None, etag
     response.raise_for_status()
-    return response.json()
+    return _loads(response.content), response.headers.get("ETag")
 
 
 def format_observation(obs):
-    """Format a single observation for display."""
-    return {
-        "species": obs.get("comName", "Unknown"),
-        "scientific_name": obs.get("sciName", ""),
-        "count": obs.get("howMany", "X"),
-        "location": obs.get("locName", "Unknown location"),
-        "date": obs.get("obsDt", ""),
-        "lat": obs.get("lat"),
-        "lng": obs.get("lng"),
-        "checklist_url": f"https://ebird.org/checklist/{obs.get('subId', '')}" if obs.get("subId") else None,
-        "species_url": f"https://ebird.org/species/{obs.get('speciesCode', '')}" if obs.get("speciesCode") else None,
-        "location_id": obs.get("locId", ""),
-        "observer": obs.get("userDisplayName", ""),
-        "is_valid": obs.get("obsValid", True),
-        "is_reviewed": obs.get("obsReviewed", False)
-    }
+    """
+    Format a single observation for display.
 
+    Fields are kept raw (they are also what data.json publishes); HTML
+    escaping happens in render_observations.
+    """
+    g = obs.get
+    sub = g("subId")
+    sp = g("speciesCode")
+    return Observation(
+        species=g("comName") or "Unknown",
+        scientific_name=g("sciName") or "",
+        count=g("howMany", "X"),
+        location=g("locName") or "Unknown location",
+        date=g("obsDt", ""),
+        lat=g("lat"),
+        lng=g("lng"),
+        checklist_url=f"https://ebird.org/checklist/{quote(sub)}" if sub else None,
+        species_url=f"https://ebird.org/species/{quote(sp)}" if sp else None,
+        location_id=g("locId", ""),
+        observer=g("userDisplayName") or "",
+        is_valid=g("obsValid", True),
+        is_reviewed=g("obsReviewed", False)
+    )
+
+
+async def fetch_region(client, semaphore, region, days_back=7, max_results=100, cached=None):
+    """
+    Fetch and format one region's observations, capturing HTTP errors.
 
-def generate_html(all_observations, config, last_updated):
-    """Generate the HTML page for GitHub Pages."""
+    Returns (region_data, etag). When cached holds the previous run's ETag
+    and observations, an unchanged region reuses them without re-parsing.
+    """
+    try:
+        async with semaphore:
+            print(f"Fetching notable observations for {region['name']} ({region['code']})...")
+            raw_obs, etag = await fetch_notable_observations(
+                client,
+                region["code"],
+                days_back=days_back,
+                max_results=max_results,
+                etag=cached["etag"] if cached else None
+            )
+        if raw_obs is None:
+            formatted = cached["observations"]
+            print(f"  Unchanged since last run, reusing {len(formatted)} sightings for {region['code']}")
+        else:
+            formatted = [format_observation(obs) for obs in raw_obs]
+            print(f"  Found {len(formatted)} notable sightings for {region['code']}")
+        return {
+            "code": region["code"],
+            "name": region["name"],
+            "observations": formatted
+        }, etag
+    except httpx.HTTPError as e:
+        print(f"  Error fetching {region['code']}: {e}")
+        return {
+            "code": region["code"],
+            "name": region["name"],
+            "observations": [],
+            "error": str(e)
+        }, None
+
+
+async def fetch_all_regions(api_key, regions, days_back=7, max_results=100, cache=None):
+    """
+    Fetch every region concurrently over one multiplexed HTTP/2 connection.
 
-    # Group by region
-    regions_html = ""
-    for region_data in all_observations:
-        region_name = region_data["name"]
-        observations = region_data["observations"]
+    Returns (all_observations, etags): the region data in the same order as
+    regions, and a {region_code: etag} map to persist for the next run.
+    """
+    cache = cache or {}
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=MAX_RETRIES,
+        limits=httpx.Limits(max_keepalive_connections=4)
+    )
+    async with httpx.AsyncClient(
+        transport=transport,
+        headers={
+            "X-eBirdApiToken": api_key,
+            "Accept-Encoding": ACCEPT_ENCODING
+        },
+        timeout=30
+    ) as client:
+        results = await asyncio.gather(*(
+            fetch_region(client, semaphore, region, days_back, max_results, cache.get(region["code"]))
+            for region in regions
+        ))
+
+    all_observations = [region_data for region_data, _ in results]
+    etags = {
+        region_data["code"]: etag
+        for region_data, etag in results
+        if etag
+    }
+    return all_observations, etags
 
-        if not observations:
-            obs_html = "<p>No notable sightings in the past week.</p>"
-        else:
-            obs_items = ""
-            for obs in observations:
-                count_str = f"{obs['count']}" if obs['count'] != "X" else "present"
-                checklist_link = f'<a href="{obs["checklist_url"]}" target="_blank">View checklist</a>' if obs["checklist_url"] else ""
-                species_link = f'<a href="{obs["species_url"]}" target="_blank">{obs["species"]}</a>' if obs["species_url"] else obs["species"]
-
-                obs_items += f"""
-                <div class="observation">
-                    <div class="species-name">{species_link}</div>
-                    <div class="species-scientific">{obs['scientific_name']}</div>
-                    <div class="details">
-                        <span class="count">{count_str}</span> at
-                        <span class="location">{obs['location']}</span>
-                    </div>
-                    <div class="meta">
-                        <span class="date">{obs['date']}</span>
-                        {checklist_link}
-                    </div>
-                </div>
-                """
-            obs_html = obs_items
-
-        regions_html += f"""
-        <section class="region">
-            <h2>{region_name}</h2>
-            <div class="observations">
-                {obs_html}
-            </div>
-        </section>
-        """
 
-    html = f"""<!DOCTYPE html>
+# Static page shell. Kept out of generate_html so the large CSS block is
+# built once at import time rather than re-interpolated on every render.
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>eBird Notable Sightings</title>
     <style>
-        :root {{
+        :root {
             --primary: #2e7d32;
             --primary-light: #4caf50;
             --bg: #f5f5f5;
@@ -115,159 +318,165 @@ def generate_html(all_observations, config, last_updated):
             --text: #333333;
             --text-light: #666666;
             --border: #e0e0e0;
-        }}
+        }
 
-        * {{
+        * {
             box-sizing: border-box;
             margin: 0;
             padding: 0;
-        }}
+        }
 
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
             background: var(--bg);
             color: var(--text);
             line-height: 1.6;
             padding: 20px;
-        }}
+        }
 
-        .container {{
+        .container {
             max-width: 900px;
             margin: 0 auto;
-        }}
+        }
 
-        header {{
+        header {
             text-align: center;
             padding: 30px 0;
             border-bottom: 2px solid var(--primary);
             margin-bottom: 30px;
-        }}
+        }
 
-        h1 {{
+        h1 {
             color: var(--primary);
             font-size: 2rem;
             margin-bottom: 10px;
-        }}
+        }
 
-        .last-updated {{
+        .last-updated {
             color: var(--text-light);
             font-size: 0.9rem;
-        }}
+        }
 
-        .region {{
+        .region {
             margin-bottom: 40px;
-        }}
+        }
 
-        .region h2 {{
+        .region h2 {
             color: var(--primary);
             border-bottom: 1px solid var(--border);
             padding-bottom: 10px;
             margin-bottom: 20px;
-        }}
+        }
 
-        .observation {{
+        .observation {
             background: var(--card-bg);
             border-radius: 8px;
             padding: 15px 20px;
             margin-bottom: 15px;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
             border-left: 4px solid var(--primary-light);
-        }}
+        }
 
-        .species-name {{
+        .species-name {
             font-size: 1.2rem;
             font-weight: 600;
             color: var(--primary);
-        }}
+        }
 
-        .species-name a {{
+        .species-name a {
             color: inherit;
             text-decoration: none;
-        }}
+        }
 
-        .species-name a:hover {{
+        .species-name a:hover {
             text-decoration: underline;
-        }}
+        }
 
-        .species-scientific {{
+        .species-scientific {
             font-style: italic;
             color: var(--text-light);
             font-size: 0.9rem;
             margin-bottom: 8px;
-        }}
+        }
 
-        .details {{
+        .details {
             margin: 8px 0;
-        }}
+        }
 
-        .count {{
+        .count {
             font-weight: 600;
             background: var(--primary-light);
             color: white;
             padding: 2px 8px;
             border-radius: 4px;
             font-size: 0.85rem;
-        }}
+        }
 
-        .location {{
+        .location {
             color: var(--text);
-        }}
+        }
 
-        .meta {{
+        .meta {
             display: flex;
             justify-content: space-between;
             align-items: center;
             margin-top: 10px;
             font-size: 0.85rem;
             color: var(--text-light);
-        }}
+        }
 
-        .meta a {{
+        .meta a {
             color: var(--primary);
             text-decoration: none;
-        }}
+        }
 
-        .meta a:hover {{
+        .meta a:hover {
             text-decoration: underline;
-        }}
+        }
 
-        footer {{
+        footer {
             text-align: center;
             padding: 30px 0;
             color: var(--text-light);
             font-size: 0.85rem;
             border-top: 1px solid var(--border);
             margin-top: 40px;
-        }}
+        }
 
-        footer a {{
+        footer a {
             color: var(--primary);
-        }}
+        }
 
-        @media (max-width: 600px) {{
-            body {{
+        @media (max-width: 600px) {
+            body {
                 padding: 10px;
-            }}
+            }
 
-            h1 {{
+            h1 {
                 font-size: 1.5rem;
-            }}
+            }
 
-            .observation {{
+            .observation {
                 padding: 12px 15px;
-            }}
-        }}
+            }
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <header>
             <h1>Notable Bird Sightings</h1>
-            <p class="last-updated">Last updated: {last_updated}</p>
-        </header>
+"""
+
+_LAST_UPDATED_TMPL = """            <p class="last-updated">Last updated: {last_updated}</p>
+"""
+
+_HTML_MAIN_OPEN = """        </header>
 
         <main>
-            {regions_html}
+            """
+
+_HTML_TAIL = """
         </main>
 
         <footer>
@@ -278,7 +487,79 @@ def generate_html(all_observations, config, last_updated):
 </body>
 </html>
 """
-    return html
+
+# Page body used when no region returned any observations (e.g. every
+# fetch failed), so there is nothing to render per region.
+_EMPTY_PAGE_TAIL = (
+    _HTML_MAIN_OPEN
+    + "<p>No notable sightings available for any region.</p>"
+    + _HTML_TAIL
+)
+
+_LAST_UPDATED_RE = re.compile(r'<p class="last-updated">Last updated: [^<]*</p>')
+
+_OBS_TMPL = (
+    '<div class="observation"><div class="species-name">{species_link}</div>'
+    '<div class="species-scientific">{scientific_name}</div>'
+    '<div class="details"><span class="count">{count_str}</span> at '
+    '<span class="location">{location}</span></div>'
+    '<div class="meta"><span class="date">{date}</span>{checklist_link}</div></div>\n'
+)
+
+_REGION_TMPL = """
+        <section class="region">
+            <h2>{name}</h2>
+            <div class="observations">
+                {obs_html}
+            </div>
+        </section>
+        """
+
+
+def render_observations(observations):
+    """
+    Render formatted observations as a list of HTML fragments, in a single
+    pass.
+
+    Free-text fields are HTML-escaped here; the records themselves stay raw.
+    """
+    return [
+        _OBS_TMPL.format(
+            species_link=f'<a href="{o.species_url}" target="_blank">{escape(o.species)}</a>' if o.species_url else escape(o.species),
+            scientific_name=escape(o.scientific_name),
+            count_str=f"{o.count}" if o.count != "X" else "present",
+            location=escape(o.location),
+            date=o.date,
+            checklist_link=f'<a href="{o.checklist_url}" target="_blank">View checklist</a>' if o.checklist_url else ""
+        )
+        for o in observations
+    ]
+
+
+def generate_html(all_observations, config, last_updated):
+    """Generate the HTML page for GitHub Pages."""
+    if not any(region_data["observations"] for region_data in all_observations):
+        return _HTML_HEAD + _LAST_UPDATED_TMPL.format(last_updated=last_updated) + _EMPTY_PAGE_TAIL
+
+    # Group by region
+    region_parts = []
+    for region_data in all_observations:
+        observations = region_data["observations"]
+
+        if not observations:
+            obs_html = "<p>No notable sightings in the past week.</p>"
+        else:
+            obs_html = "".join(render_observations(observations))
+
+        region_parts.append(_REGION_TMPL.format(name=region_data["name"], obs_html=obs_html))
+
+    return (
+        _HTML_HEAD
+        + _LAST_UPDATED_TMPL.format(last_updated=last_updated)
+        + _HTML_MAIN_OPEN
+        + "".join(region_parts)
+        + _HTML_TAIL
+    )
 
 
 def main():
@@ -290,55 +571,72 @@ def main():
     # Load config
     config = load_config()
 
-    # Fetch observations for each region
-    all_observations = []
-    for region in config["regions"]:
-        print(f"Fetching notable observations for {region['name']} ({region['code']})...")
-        try:
-            raw_obs = fetch_notable_observations(
-                api_key,
-                region["code"],
-                days_back=config.get("days_back", 7),
-                max_results=config.get("max_results", 100)
-            )
-            formatted = [format_observation(obs) for obs in raw_obs]
-            all_observations.append({
-                "code": region["code"],
-                "name": region["name"],
-                "observations": formatted
-            })
-            print(f"  Found {len(formatted)} notable sightings")
-        except requests.exceptions.HTTPError as e:
-            print(f"  Error fetching {region['code']}: {e}")
-            all_observations.append({
-                "code": region["code"],
-                "name": region["name"],
-                "observations": [],
-                "error": str(e)
-            })
-
-    # Generate timestamp
-    last_updated = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
-
     # Create output directory
     output_dir = Path(__file__).parent / "docs"
     output_dir.mkdir(exist_ok=True)
 
+    # Previous run's state is only reused if it came from this exact script
+    state = load_state(output_dir)
+    current_source = source_hash()
+    state_valid = state.get("source_hash") == current_source
+
+    # Fetch all regions concurrently; gather preserves config order
+    all_observations, etags = asyncio.run(fetch_all_regions(
+        api_key,
+        config["regions"],
+        days_back=config.get("days_back", 7),
+        max_results=config.get("max_results", 100),
+        cache=load_cache(output_dir) if state_valid else None
+    ))
+
+    # Generate timestamp
+    last_updated = time.strftime(LAST_UPDATED_FORMAT, time.gmtime())
+
     # Save JSON data
     json_output = {
         "last_updated": last_updated,
         "config": config,
         "regions": all_observations
     }
-    with open(output_dir / "data.json", "w") as f:
-        json.dump(json_output, f, indent=2)
+    # Serialize in one shot and write the bytes in a single call
+    json_bytes = _dumps(json_output)
+    write_atomic(output_dir / "data.json", json_bytes)
     print(f"Saved data to {output_dir / 'data.json'}")
 
-    # Generate and save HTML
-    html = generate_html(all_observations, config, last_updated)
-    with open(output_dir / "index.html", "w") as f:
-        f.write(html)
-    print(f"Saved HTML to {output_dir / 'index.html'}")
+    # Pre-compressed copies for clients that fetch data.json directly.
+    # mtime=0 keeps the gzip output deterministic between identical runs.
+    write_atomic(output_dir / "data.json.gz", gzip.compress(json_bytes, compresslevel=6, mtime=0))
+    if brotli is not None:
+        write_atomic(output_dir / "data.json.br", brotli.compress(json_bytes, quality=5))
+    else:
+        # Don't leave a stale copy behind that no longer matches data.json
+        (output_dir / "data.json.br").unlink(missing_ok=True)
+
+    # Save ETags for conditional requests on the next run
+    write_atomic(output_dir / ETAGS_FILENAME, _dumps(etags))
+
+    # Render the page only if the observations changed; otherwise just
+    # refresh the timestamp in the existing one
+    new_hash = content_hash(all_observations)
+    index_path = output_dir / "index.html"
+    if state_valid and new_hash == state.get("content_hash") and index_path.exists():
+        html = _LAST_UPDATED_RE.sub(
+            lambda _: f'<p class="last-updated">Last updated: {last_updated}</p>',
+            index_path.read_text(encoding="utf-8"),
+            count=1
+        )
+        print("Observations unchanged, refreshed timestamp only")
+    else:
+        html = generate_html(all_observations, config, last_updated)
+    # Encode up front so the page goes to disk in a single write
+    write_atomic(index_path, html.encode("utf-8"))
+    print(f"Saved HTML to {index_path}")
+
+    # Save the content hash so an unchanged next run can skip rendering
+    write_atomic(output_dir / STATE_FILENAME, _dumps({
+        "source_hash": current_source,
+        "content_hash": new_hash
+    }))
 
 
 if __name__ == "__main__":